@@ -10,7 +10,6 @@ from dotenv import load_dotenv
 import base64
 from PIL import Image
 import io
-import PyPDF2
 import fitz  # PyMuPDF for better PDF processing
 
 # Load environment variables
@@ -117,7 +116,7 @@ class EnhancedMetadataExtractorTool:
             return content_analysis
             
         except Exception as e:
-            # Fallback to PyPDF2 if PyMuPDF fails
+            # Retry PyMuPDF with an explicit filetype and minimal text flags
             try:
                 return self._extract_pdf_content_fallback(file_path)
             except Exception as e2:
@@ -129,33 +128,34 @@ class EnhancedMetadataExtractorTool:
                 }
     
     def _extract_pdf_content_fallback(self, file_path: str) -> Dict:
-        """Fallback PDF extraction using PyPDF2"""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
+        """Fallback PDF extraction: force the PDF filetype and skip pages that fail to parse"""
+        doc = fitz.open(file_path, filetype="pdf")
+        try:
             content_analysis = {
                 "pdf_analysis": {
-                    "total_pages": len(pdf_reader.pages),
-                    "extraction_method": "PyPDF2_fallback",
+                    "total_pages": len(doc),
+                    "extraction_method": "PyMuPDF_fallback",
                     "text_content": "",
                     "has_text": False
                 }
             }
             
             full_text = ""
-            for page in pdf_reader.pages:
+            for page in doc:
                 try:
-                    text = page.extract_text()
+                    text = page.get_text("text", flags=fitz.TEXT_PRESERVE_WHITESPACE)
                     full_text += text + "\n"
-                except:
+                except Exception:
                     continue
-            
-            content_analysis["pdf_analysis"]["text_content"] = full_text[:2000] + "..." if len(full_text) > 2000 else full_text
-            content_analysis["pdf_analysis"]["has_text"] = len(full_text.strip()) > 0
-            content_analysis["pdf_analysis"]["character_count"] = len(full_text)
-            content_analysis["pdf_analysis"]["word_count"] = len(full_text.split())
-            
-            return content_analysis
+        finally:
+            doc.close()
+        
+        content_analysis["pdf_analysis"]["text_content"] = full_text[:2000] + "..." if len(full_text) > 2000 else full_text
+        content_analysis["pdf_analysis"]["has_text"] = len(full_text.strip()) > 0
+        content_analysis["pdf_analysis"]["character_count"] = len(full_text)
+        content_analysis["pdf_analysis"]["word_count"] = len(full_text.split())
+        
+        return content_analysis
 
 # Configure Gemini LLM
 gemini_llm = LLM(
@@ -7,81 +7,148 @@ import os
 import json
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    # Optional speedup; save_results falls back to the standard json module
+    orjson = None
 
 # Add the agents directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'agents'))
 
 # Import the agents
 from agents.agents import (
-    document_processing_crew, 
+    get_document_processing_crew, 
     metadata_extractor, 
-    categorize_files_by_type,
-    get_image_metadata
+    classify_extension,
+    get_image_metadata,
+    TEXT_CONTENT_LIMIT
 )
 
+# Batches smaller than this are stat-ed and image-probed inline; thread pool
+# start-up costs more than it saves on single uploads
+PARALLEL_MIN_FILES = 4
+IO_MAX_WORKERS = 8
+
+# Below this much extracted text (e.g. scan-only PDFs before OCR) the agent has
+# nothing to analyze, so the LLM roundtrip is skipped
+MIN_EXTRACTED_CHARS = 50
+
+# Plain-text formats are decoded leniently; anything else (e.g. .docx/.xlsx,
+# which are ZIP archives) must decode cleanly or is treated as unreadable
+_LENIENT_TEXT_EXT = frozenset({'.txt'})
+
+class FileEntry(NamedTuple):
+    """A single input file, stat-ed and classified once per run"""
+    path: str
+    name: str
+    ext: str
+    stat: os.stat_result
+    category: str
+
+def _stat_or_none(file_path: str) -> Optional[os.stat_result]:
+    """Stat a file, returning None when it cannot be accessed"""
+    try:
+        return os.stat(file_path)
+    except OSError:
+        return None
+
+def _build_document_content(entry: FileEntry, metadata: Dict) -> Tuple[Dict, int]:
+    """Prepare the agent input for one document, returning it with its count of extracted text characters"""
+    content = {
+        'file_name': entry.name,
+        'file_path': entry.path,
+        'file_type': metadata.get('file_type', 'Unknown')
+    }
+    
+    # For PDFs, include the extracted text content
+    if 'pdf_analysis' in metadata and 'text_content' in metadata['pdf_analysis']:
+        content['text_content'] = metadata['pdf_analysis']['text_content']
+    else:
+        # For other file types, we would need to read the content
+        try:
+            # Read one character past the limit so truncation is known without loading the whole file
+            errors = 'replace' if entry.ext in _LENIENT_TEXT_EXT else 'strict'
+            with open(entry.path, 'r', encoding='utf-8', errors=errors) as f:
+                file_content = f.read(TEXT_CONTENT_LIMIT + 1)
+            content['text_content'] = file_content[:TEXT_CONTENT_LIMIT] + "..." if len(file_content) > TEXT_CONTENT_LIMIT else file_content
+        except Exception as e:
+            content['text_content'] = f"[Error reading file content: {str(e)}]"
+            return content, 0
+    
+    # Replacement characters stand in for undecodable bytes, not extracted text
+    text = content['text_content'].strip()
+    return content, len(text) - text.count('\ufffd')
+
 def process_files(file_paths: List[str]) -> Dict:
     """Process documents and images using separate specialized agents"""
     
     print("Starting processing with specialized Document agent...")
     
-    # Categorize files
-    categorized_files = categorize_files_by_type(file_paths)
-    
-    # Step 1: Process basic metadata
+    # Step 1: Classify, stat and extract metadata in a single pass over the inputs,
+    # preparing document content for the agent as we go
     print('Extracting file metadata...')
+    categorized_files = {
+        'images': [],
+        'documents': [],
+        'other': []
+    }
     collected_docs = []
+    document_contents = []
+    extracted_chars = 0
     
-    for file_path in file_paths:
-        if os.path.exists(file_path):
-            metadata = metadata_extractor.extract_metadata(file_path)
+    # Stats and image header reads are I/O bound and release the GIL, so large
+    # batches overlap them on threads; PDF parsing already fans out to processes
+    pool = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS) if len(file_paths) >= PARALLEL_MIN_FILES else None
+    try:
+        stats = pool.map(_stat_or_none, file_paths) if pool else map(_stat_or_none, file_paths)
+        image_jobs = []
+        
+        for file_path, st in zip(file_paths, stats):
+            ext = os.path.splitext(file_path)[1].lower()
+            category = classify_extension(ext)
+            categorized_files[category].append(file_path)
+            
+            if st is None:
+                print(f"[ERROR] File not found: {file_path}")
+                continue
+            
+            entry = FileEntry(file_path, os.path.basename(file_path), ext, st, category)
+            metadata = metadata_extractor.extract_metadata_from_stat(entry.path, entry.stat, entry.ext)
             
             # Add image-specific metadata if it's an image
-            if file_path in categorized_files['images']:
-                image_meta = get_image_metadata(file_path)
-                metadata.update({"image_metadata": image_meta})
+            if entry.category == 'images':
+                if pool:
+                    image_jobs.append((metadata, pool.submit(get_image_metadata, entry.path)))
+                else:
+                    image_meta = get_image_metadata(entry.path)
+                    metadata.update({"image_metadata": image_meta})
+            else:
+                content, text_chars = _build_document_content(entry, metadata)
+                document_contents.append(content)
+                extracted_chars += text_chars
             
             collected_docs.append(metadata)
-        else:
-            print(f"[ERROR] File not found: {file_path}")
+        
+        for metadata, future in image_jobs:
+            metadata.update({"image_metadata": future.result()})
+    finally:
+        if pool:
+            pool.shutdown()
     
     # Step 2: Process documents with Document Processing Agent
     document_results = None
-    if categorized_files['documents'] or categorized_files['other']:
+    document_agent_used = False
+    if (categorized_files['documents'] or categorized_files['other']) and extracted_chars < MIN_EXTRACTED_CHARS:
+        print('Skipping Document Processing Agent: no extractable text')
+        document_results = "Skipped: no extractable text"
+    elif categorized_files['documents'] or categorized_files['other']:
         print('Running Document Processing Agent...')
-        
-        # Prepare document content for the agent
-        document_contents = []
-        for doc in collected_docs:
-            if doc['file_path'] in categorized_files['documents'] + categorized_files['other']:
-                # For PDFs, include the extracted text content
-                if 'pdf_analysis' in doc and 'text_content' in doc['pdf_analysis']:
-                    content = {
-                        'file_name': doc['file_name'],
-                        'file_path': doc['file_path'],
-                        'file_type': doc['file_type'],
-                        'text_content': doc['pdf_analysis']['text_content']
-                    }
-                else:
-                    # For other file types, we would need to read the content
-                    try:
-                        with open(doc['file_path'], 'r', encoding='utf-8') as f:
-                            file_content = f.read()
-                        content = {
-                            'file_name': doc['file_name'],
-                            'file_path': doc['file_path'],
-                            'file_type': doc['file_type'],
-                            'text_content': file_content[:2000] + "..." if len(file_content) > 2000 else file_content
-                        }
-                    except Exception as e:
-                        content = {
-                            'file_name': doc['file_name'],
-                            'file_path': doc['file_path'],
-                            'file_type': doc['file_type'],
-                            'text_content': f"[Error reading file content: {str(e)}]"
-                        }
-                document_contents.append(content)
+        document_agent_used = True
         
         doc_input = {
             "documents": document_contents,
@@ -89,7 +156,7 @@ def process_files(file_paths: List[str]) -> Dict:
         }
         
         try:
-            document_results = document_processing_crew.kickoff(inputs=doc_input)
+            document_results = get_document_processing_crew().kickoff(inputs=doc_input)
         except Exception as e:
             print(f"Document processing warning: {str(e)}")
             document_results = "Document processing completed with basic metadata only"
@@ -125,7 +192,7 @@ def process_files(file_paths: List[str]) -> Dict:
     }
     
     # Track which agents were used
-    if document_results:
+    if document_agent_used:
         final_package["agents_used"].append("Document Processing Agent")
     if vision_results:
         final_package["agents_used"].append("Basic Image Processing")
@@ -137,8 +204,12 @@ def process_files(file_paths: List[str]) -> Dict:
 def save_results(result: Dict, output_path: str):
     """Save results to a JSON file"""
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, default=str)
+        if orjson is not None:
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(result, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, default=str)
         print(f"[SUCCESS] Results saved to {output_path}")
     except Exception as e:
         print(f"[ERROR] Error saving results: {str(e)}")